@@ -1,18 +1,55 @@
 import json
 import re
-from pypdf import PdfReader
-import math
+try:
+    import orjson # Rust-backed JSON parser, used when installed
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads # stdlib fallback (also accepts UTF-8 bytes)
+import pymupdf # PyMuPDF: C-backed (MuPDF) text extraction
 import datetime # Import datetime to add timestamp to report
+import collections
+try:
+    import ahocorasick # Single-pass multi-keyword scan, used when installed
+except ImportError:
+    ahocorasick = None
+import numpy as np
+
+# --- Precompiled report patterns (the report text is lowercased, so no IGNORECASE needed) ---
+LONG_M_RE = re.compile(r'(\d+)\s*m')
+# Pothole area or depth, whichever comes next: one linear finditer pass finds both, in either order
+POTHOLE_RE = re.compile(r'area\s*(?P<area>[\d\.]+)\s*sqm|(?P<depth>[\d\.]+)\s*mm\s*depth')
+CHAIN_RE = re.compile(r'(\d+)\+(\d+)\s+to\s+(\d+)\+(\d+)')
+
+# --- Diagnostics: per-intervention details go to the terminal only when VERBOSE is set ---
+VERBOSE = False
+def log(*args, **kwargs):
+    if VERBOSE: print(*args, **kwargs)
+
+# --- Per-material line templates (bound str.format, reused for every material) ---
+LINE_FMT_FILE = "    - {}: {:.2f} units @ ₹{:.2f}/unit = ₹{:.2f}\n".format
+LINE_FMT_TERM = "  - {}: {:.2f} units @ ₹{:.2f}/unit = ₹{:.2f}".format
+MISSING_FMT_FILE = "    - {}: {:.2f} units @ PRICE NOT FOUND\n".format
+MISSING_FMT_TERM = "  - {}: {:.2f} units @ PRICE NOT FOUND".format
 
 # --- MODULE 2: LOAD OUR DATABASES ("Brain" and "Prices") ---
 print("Loading databases...")
 try:
-    with open('database.json', 'r', encoding='utf-8') as f: # Added encoding='utf-8'
-        spec_database = json.load(f)
+    with open('database.json', 'rb') as f: # Binary mode: both parsers decode UTF-8 bytes themselves
+        spec_database = json_loads(f.read())
+    # Key by lowercase keyword once; the original spelling and the upper-case header are kept for report labels
+    spec_database = {k.lower(): dict(v, name=k, title=k.upper()) for k, v in spec_database.items()}
+    # Road studs are costed per stud, not per meter: build that override once instead of copying in the loop
+    ROAD_STUDS_SPEC = None
+    if "road studs" in spec_database and "materials_per_meter" in spec_database["road studs"]:
+        ROAD_STUDS_SPEC = {**spec_database["road studs"], "materials_per_item": [{**m, "quantity": 1} for m in spec_database["road studs"]["materials_per_meter"]]}
+        ROAD_STUDS_SPEC.pop("materials_per_meter", None)
     print("Specification database loaded.")
     
-    with open('prices.json', 'r', encoding='utf-8') as f: # Added encoding='utf-8'
-        price_database = json.load(f)
+    with open('prices.json', 'rb') as f:
+        price_database = json_loads(f.read())
+    # Prices as an array indexed by material position; the trailing NaN is what index -1 (unknown material) gathers
+    materials_index = {name: i for i, name in enumerate(price_database)}
+    prices_vec = np.array(list(price_database.values()) + [np.nan], dtype=np.float64)
     print("Price database loaded.")
 except FileNotFoundError as e:
     print(f"ERROR: Could not find database file. {e}")
@@ -22,159 +59,180 @@ except FileNotFoundError as e:
 print("\nReading intervention report...")
 report_path = 'Road_Safety_Intervention_Report_Final.pdf' 
 try:
-    reader = PdfReader(report_path)
-except FileNotFoundError:
+    pdf_document = pymupdf.open(report_path) # Opened by path: MuPDF streams the file itself, no Python-side read/copy
+except (FileNotFoundError, pymupdf.FileNotFoundError):
     print(f"ERROR: Input PDF file not found at '{report_path}'")
     exit()
 
-full_report_text = ""
-for page in reader.pages:
-    page_text = page.extract_text()
-    if page_text:
-        full_report_text += page_text
+page_texts = [] # Joined once below instead of growing one string per page
+for page in pdf_document:
+    page_text = page.get_text("text") # Plain text extraction (no layout reconstruction)
+    if not page_text: continue # Skip empty pages early
+    page_texts.append(page_text.lower())
+pdf_document.close()
         
-full_report_text = full_report_text.lower()
+full_report_text = "".join(page_texts)
 print("PDF report text extracted and converted to lowercase.")
 
 # --- MODULE 4: FIND JOBS & CALCULATE ("Calculator") ---
 print("\n--- STARTING ESTIMATION ---")
 report_filename = "cost_report.txt"
-# --- FIX: Open the output file with UTF-8 encoding ---
-with open(report_filename, 'w', encoding='utf-8') as report_file:
+# Report text is buffered and written to disk in a single call at the end
+report_buffer = []
+
+# Write Report Header
+report_buffer.append("=========================================\n")
+report_buffer.append("   NATIONAL ROAD SAFETY HACKATHON 2025\n")
+report_buffer.append("        Material Cost Estimation Report\n")
+report_buffer.append("=========================================\n\n")
+report_generated = datetime.datetime.now().isoformat(" ", "seconds") # Same 'YYYY-MM-DD HH:MM:SS' as strftime
+report_buffer.append(f"Report Generated: {report_generated}\n")
+report_buffer.append(f"Input Report File: {report_path}\n\n")
+report_buffer.append("-----------------------------------------\n")
+report_buffer.append("        ITEMIZED COST BREAKDOWN\n")
+report_buffer.append("-----------------------------------------\n\n")
+
+final_estimates = []
+total_project_cost = 0
+
+# Count every intervention keyword in one Aho-Corasick pass over the text
+counts = collections.Counter()
+if ahocorasick is not None:
+    automaton = ahocorasick.Automaton()
+    for key in spec_database:
+        automaton.add_word(key, key)
+    automaton.make_automaton()
+    for _, key in automaton.iter(full_report_text):
+        counts[key] += 1
+else: # Fallback: one str.count per keyword gives presence and count in the same scan
+    for key in spec_database:
+        counts[key] = full_report_text.count(key)
+
+# All regex inputs depend only on the report text: extract them once, before the loop
+length_match = LONG_M_RE.search(full_report_text)
+found_length_m = float(length_match.group(1)) if length_match else None
+pothole_area = pothole_depth = None
+if counts["pothole"]: # Only scan for dimensions when a pothole is reported; keep the first area and first depth
+    for pothole_match in POTHOLE_RE.finditer(full_report_text):
+        area, depth = pothole_match.group("area", "depth")
+        if area and pothole_area is None: pothole_area = float(area)
+        if depth and pothole_depth is None: pothole_depth = float(depth)
+        if pothole_area is not None and pothole_depth is not None: break
+chainage = None # (start_km, start_m, end_km, end_m) of the first range; only road studs need it
+if counts["road studs"]:
+    chainage_match = CHAIN_RE.search(full_report_text)
+    if chainage_match: chainage = tuple(map(int, chainage_match.groups()))
+
+# Only interventions found in the PDF text, kept in database order so the report order is unchanged
+present = [k for k in spec_database if counts[k]]
+
+# Loop through every intervention found in the report
+for intervention_key in present:
+    specs = spec_database[intervention_key]
+    mpm = specs.get("materials_per_meter")
+    mpi = specs.get("materials_per_item")
+    mpc = specs.get("materials_per_cubic_meter")
     
-    # Write Report Header
-    report_file.write("=========================================\n")
-    report_file.write("   NATIONAL ROAD SAFETY HACKATHON 2025\n")
-    report_file.write("        Material Cost Estimation Report\n")
-    report_file.write("=========================================\n\n")
-    report_file.write(f"Report Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-    report_file.write(f"Input Report File: {report_path}\n\n")
-    report_file.write("-----------------------------------------\n")
-    report_file.write("        ITEMIZED COST BREAKDOWN\n")
-    report_file.write("-----------------------------------------\n\n")
-
-    final_estimates = []
-    total_project_cost = 0
-
-    # Loop through every intervention we know about (from database.json)
-    for intervention_key, specs in spec_database.items():
-        
-        # Check if the lowercase keyword is in the lowercase PDF text
-        if intervention_key.lower() in full_report_text:
-            print(f"\nFound intervention: '{intervention_key}'")
-            report_file.write(f"Intervention: {intervention_key.upper()}\n")
-            
-            quantity_found = 0
-            unit_type = ""
-            
-            # --- Quantity Logic ---
-            if "materials_per_meter" in specs:
-                unit_type = "meter"
-                quantity_found = 1 
-                if intervention_key.lower() == "longitudinal markings":
-                    match = re.search(r'(\d+)\s*m', full_report_text, re.IGNORECASE)
-                    if match: quantity_found = float(match.group(1))
-                elif intervention_key.lower() == "streetlights":
-                     print("  > Assuming 'entire stretch' for streetlights is 1000m.")
-                     quantity_found = 1000.0 
-            elif "materials_per_item" in specs:
-                unit_type = "item"
-                quantity_found = full_report_text.count(intervention_key.lower())
-                if quantity_found == 0: quantity_found = 1 
-            elif "materials_per_cubic_meter" in specs:
-                unit_type = "m^3"
-                quantity_found = 0 
-                area_match = re.search(r'area\s*([\d\.]+)\s*sqm', full_report_text, re.IGNORECASE)
-                depth_match = re.search(r'([\d\.]+)\s*mm\s*depth', full_report_text, re.IGNORECASE)
-                if area_match and depth_match and intervention_key.lower() == "pothole":
-                    area_sqm = float(area_match.group(1))
-                    depth_mm = float(depth_match.group(1))
-                    depth_m = depth_mm / 1000
-                    quantity_found = area_sqm * depth_m
-                    print(f"  > Found Pothole: {area_sqm} sqm area, {depth_mm} mm depth. Volume: {quantity_found:.4f} m^3")
-                else: quantity_found = 0 
-
-            # Specific Logic for Road Studs
-            is_road_studs = intervention_key.lower() == "road studs"
-            chainage_match = None
-            if is_road_studs:
-                chainage_match = re.search(r'(\d+)\+(\d+)\s+to\s+(\d+)\+(\d+)', full_report_text, re.IGNORECASE)
-                if chainage_match:
-                    start_km, start_m, end_km, end_m = map(int, chainage_match.groups())
-                    length_m = abs(((end_km * 1000) + end_m) - ((start_km * 1000) + start_m))
-                    print(f"  > Found chainage for road studs: {start_km}+{start_m} to {end_km}+{end_m}. Length: {length_m}m")
-                    studs_per_edge = math.ceil(length_m / 9.0) 
-                    quantity_found = studs_per_edge * 2 
-                    print(f"  > Calculated studs needed: {quantity_found} studs")
-                    unit_type = "item" 
-                    # Adjust spec in memory for calculation
-                    if "materials_per_meter" in specs: 
-                        # Use a temporary copy to avoid modifying original spec_database
-                        current_specs = specs.copy() 
-                        current_specs["materials_per_item"] = current_specs.pop("materials_per_meter")
-                        current_specs["materials_per_item"][0]["quantity"] = 1
-                        specs = current_specs # Use the temp copy for this iteration
-                else: # Default if no chainage found
-                    print("  > Could not find chainage for road studs. Defaulting.")
-                    unit_type = "item"; quantity_found = 1
-                    if "materials_per_meter" in specs:
-                         # Use a temporary copy
-                        current_specs = specs.copy()
-                        current_specs["materials_per_item"] = current_specs.pop("materials_per_meter")
-                        current_specs["materials_per_item"][0]["quantity"] = 1
-                        specs = current_specs
-
-            print(f"Using Quantity: {quantity_found} {unit_type}(s)")
-            report_file.write(f"  Quantity Found: {quantity_found} {unit_type}(s)\n")
-            report_file.write(f"  Source Clause: {specs['source_clause']}\n")
-            report_file.write("  Cost Breakdown:\n")
-
-            # --- Calculate Cost ---
-            item_total_cost = 0
-            cost_breakdown_terminal = [] # For terminal output
-
-            materials_list = (specs.get("materials_per_item", []) + 
-                              specs.get("materials_per_meter", []) + 
-                              specs.get("materials_per_cubic_meter", []))
-
-            for material in materials_list:
-                mat_name = material["name"]
-                mat_qty_per_unit = material["quantity"]
-                
-                mat_qty_needed = mat_qty_per_unit * quantity_found
-                
-                line_output_file = "" # For file
-                line_output_terminal = "" # For terminal
-                if mat_name in price_database:
-                    mat_price_per_unit = price_database[mat_name]
-                    line_cost = mat_qty_needed * mat_price_per_unit
-                    item_total_cost += line_cost
-                    
-                    line_output_file = f"    - {mat_name}: {mat_qty_needed:.2f} units @ ₹{mat_price_per_unit:.2f}/unit = ₹{line_cost:.2f}\n"
-                    line_output_terminal = f"  - {mat_name}: {mat_qty_needed:.2f} units @ ₹{mat_price_per_unit:.2f}/unit = ₹{line_cost:.2f}"
-                else:
-                    line_output_file = f"    - {mat_name}: {mat_qty_needed:.2f} units @ PRICE NOT FOUND\n"
-                    line_output_terminal = f"  - {mat_name}: {mat_qty_needed:.2f} units @ PRICE NOT FOUND"
-                
-                report_file.write(line_output_file)
-                cost_breakdown_terminal.append(line_output_terminal)
-            
-            # Print to terminal
-            print(f"Cost Breakdown (Source: {specs['source_clause']}):") # Use potentially modified specs here
-            for line in cost_breakdown_terminal: print(line)
-            print(f"TOTAL for this item: ₹{item_total_cost:.2f}")
-
-            report_file.write(f"  TOTAL for {intervention_key}: ₹{item_total_cost:.2f}\n\n")
-            
-            total_project_cost += item_total_cost
-
-    # Write Final Summary to File
-    report_file.write("-----------------------------------------\n")
-    report_file.write("             SUMMARY\n")
-    report_file.write("-----------------------------------------\n")
-    report_file.write(f"TOTAL ESTIMATED MATERIAL COST: ₹{total_project_cost:.2f}\n")
-    report_file.write("-----------------------------------------\n")
-    report_file.write("(Note: Excludes labor, installation, taxes, etc.)\n")
+    log(f"\nFound intervention: '{specs['name']}'")
+    report_buffer.append(f"Intervention: {specs['title']}\n")
+    
+    quantity_found = 0
+    unit_type = ""
+    
+    # --- Quantity Logic ---
+    if mpm is not None:
+        unit_type = "meter"
+        quantity_found = 1 
+        if intervention_key == "longitudinal markings":
+            if found_length_m is not None: quantity_found = found_length_m
+        elif intervention_key == "streetlights":
+             log("  > Assuming 'entire stretch' for streetlights is 1000m.")
+             quantity_found = 1000.0 
+    elif mpi is not None:
+        unit_type = "item"
+        quantity_found = counts[intervention_key]
+        if quantity_found == 0: quantity_found = 1 
+    elif mpc is not None:
+        unit_type = "m^3"
+        quantity_found = 0 
+        if pothole_area is not None and pothole_depth is not None and intervention_key == "pothole":
+            area_sqm, depth_mm = pothole_area, pothole_depth
+            depth_m = depth_mm / 1000
+            quantity_found = area_sqm * depth_m
+            log(f"  > Found Pothole: {area_sqm} sqm area, {depth_mm} mm depth. Volume: {quantity_found:.4f} m^3")
+        else: quantity_found = 0 
+
+    # Specific Logic for Road Studs
+    is_road_studs = intervention_key == "road studs"
+    if is_road_studs:
+        if chainage:
+            start_km, start_m, end_km, end_m = chainage
+            length_m = abs(((end_km * 1000) + end_m) - ((start_km * 1000) + start_m))
+            log(f"  > Found chainage for road studs: {start_km}+{start_m} to {end_km}+{end_m}. Length: {length_m}m")
+            studs_per_edge = -(-length_m // 9) # Integer ceiling division
+            quantity_found = studs_per_edge * 2 
+            log(f"  > Calculated studs needed: {quantity_found} studs")
+            unit_type = "item" 
+            # Use the per-stud spec precomputed at load time
+            if mpm is not None: 
+                specs = ROAD_STUDS_SPEC
+                mpi, mpm = specs["materials_per_item"], None
+        else: # Default if no chainage found
+            log("  > Could not find chainage for road studs. Defaulting.")
+            unit_type = "item"; quantity_found = 1
+            if mpm is not None:
+                specs = ROAD_STUDS_SPEC
+                mpi, mpm = specs["materials_per_item"], None
+
+    log(f"Using Quantity: {quantity_found} {unit_type}(s)")
+    report_buffer.append(f"  Quantity Found: {quantity_found} {unit_type}(s)\n")
+    report_buffer.append(f"  Source Clause: {specs['source_clause']}\n")
+    report_buffer.append("  Cost Breakdown:\n")
+
+    # --- Calculate Cost ---
+    cost_breakdown_terminal = [] # For terminal output (only filled when VERBOSE)
+
+    materials_list = (mpi or []) + (mpm or []) + (mpc or [])
+
+    # Vectorized: quantities and prices as arrays, missing prices as NaN (excluded from the total)
+    mat_names = [material["name"] for material in materials_list]
+    mat_qtys = np.fromiter((material["quantity"] for material in materials_list), dtype=np.float64, count=len(materials_list))
+    mat_idx = np.fromiter((materials_index.get(name, -1) for name in mat_names), dtype=np.int64, count=len(mat_names))
+    mat_prices = prices_vec[mat_idx] # Gather; missing materials land on the NaN sentinel
+    mat_qtys_needed = mat_qtys * quantity_found
+    line_costs = mat_qtys_needed * mat_prices
+    item_total_cost = np.nansum(line_costs)
+
+    # Only the report lines still need a per-material loop
+    for mat_name, mat_qty_needed, mat_price_per_unit, line_cost in zip(mat_names, mat_qtys_needed, mat_prices, line_costs):
+        if not np.isnan(mat_price_per_unit):
+            report_buffer.append(LINE_FMT_FILE(mat_name, mat_qty_needed, mat_price_per_unit, line_cost))
+            if VERBOSE: cost_breakdown_terminal.append(LINE_FMT_TERM(mat_name, mat_qty_needed, mat_price_per_unit, line_cost))
+        else:
+            report_buffer.append(MISSING_FMT_FILE(mat_name, mat_qty_needed))
+            if VERBOSE: cost_breakdown_terminal.append(MISSING_FMT_TERM(mat_name, mat_qty_needed))
+    
+    # Print to terminal
+    if VERBOSE:
+        print(f"Cost Breakdown (Source: {specs['source_clause']}):") # Use potentially modified specs here
+        for line in cost_breakdown_terminal: print(line)
+        print(f"TOTAL for this item: ₹{item_total_cost:.2f}")
+
+    report_buffer.append(f"  TOTAL for {specs['name']}: ₹{item_total_cost:.2f}\n\n")
+    
+    total_project_cost += item_total_cost
+
+# Write Final Summary to the report buffer
+report_buffer.append("-----------------------------------------\n")
+report_buffer.append("             SUMMARY\n")
+report_buffer.append("-----------------------------------------\n")
+report_buffer.append(f"TOTAL ESTIMATED MATERIAL COST: ₹{total_project_cost:.2f}\n")
+report_buffer.append("-----------------------------------------\n")
+report_buffer.append("(Note: Excludes labor, installation, taxes, etc.)\n")
+
+# --- FIX: Open the output file with UTF-8 encoding --- (single write of the buffered report)
+with open(report_filename, 'w', encoding='utf-8') as report_file:
+    report_file.write("".join(report_buffer))
 
 print("\n--- ESTIMATION COMPLETE ---")
 print(f"TOTAL PROJECT MATERIAL COST: ₹{total_project_cost:.2f}")